@@ -1,8 +1,160 @@
-from fastapi import FastAPI
-from .models import UiAck
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Optional, Tuple
+import os, json, httpx, asyncio
+from .models import UiAck, KpiStreamStats
 
 app = FastAPI(title="ui")
 
+ORCH = os.getenv("ORCHESTRATION_URL", "http://orch:8000")
+POLL_INTERVAL = float(os.getenv("KPI_POLL_INTERVAL", "1.0"))   # seconds between upstream pulls
+KEEPALIVE     = float(os.getenv("KPI_KEEPALIVE", "15.0"))      # seconds before an SSE comment ping
+DISCONNECT_CHECK = float(os.getenv("KPI_DISCONNECT_CHECK", "1.0"))  # seconds between closed-tab checks
+
+class KpiHub:
+    """
+    One upstream KPI subscription shared by every connected dashboard.
+
+    The poller only runs while at least one subscriber is attached and
+    publishes a new snapshot only when something changed. Subscribers never
+    queue frames: each one diffs the *latest* snapshot against the last one
+    it actually sent, so slow clients skip stale intermediate frames and the
+    deltas they do get still apply cleanly.
+    """
+    def __init__(self) -> None:
+        self.latest: Dict[str, Any] = {}
+        self.seq: int = 0
+        self.subscribers: int = 0
+        self.last_error: Optional[str] = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.last_error is None
+
+    @property
+    def upstream_active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def subscribe(self) -> int:
+        """Attach a subscriber; returns the seq it should treat as already seen."""
+        self.subscribers += 1
+        if not self.upstream_active:
+            self._task = asyncio.create_task(self._poll())
+        # a fresh poller run has no snapshot yet: wait for its first publish
+        return self.seq - 1 if self.latest else self.seq
+
+    def unsubscribe(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers <= 0 and self._task is not None:
+            self.subscribers = 0
+            self._task.cancel()
+            self._task = None
+            # drop state from this run so the next subscriber never gets an old
+            # snapshot; seq keeps counting so frame ids never repeat
+            self.latest = {}
+            self.last_error = None
+
+    def publish(self, snapshot: Dict[str, Any]) -> None:
+        if snapshot == self.latest:
+            return
+        self.latest = snapshot
+        self._bump()
+
+    def set_error(self, error: Optional[str]) -> None:
+        # only ok <-> failing transitions wake subscribers, not every new message
+        flipped = (error is None) != self.ok
+        self.last_error = error
+        if flipped:
+            self._bump()
+
+    def _bump(self) -> None:
+        self.seq += 1
+        # wake everyone waiting on the current event, then arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, after_seq: int, timeout: float) -> Tuple[int, Dict[str, Any]]:
+        """Return (seq, snapshot) once seq > after_seq, or the current one on timeout."""
+        if self.seq <= after_seq:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.seq, self.latest
+
+    def stats(self) -> KpiStreamStats:
+        return KpiStreamStats(subscribers=self.subscribers, upstream_active=self.upstream_active,
+                              seq=self.seq, last_error=self.last_error)
+
+    async def _poll(self) -> None:
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            while True:
+                try:
+                    r = await client.get(f"{ORCH}/v1/kpi")
+                    r.raise_for_status()
+                    self.publish(r.json())
+                    self.set_error(None)
+                except Exception as e:
+                    self.set_error(f"{type(e).__name__}: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+
+_hub = KpiHub()
+
+def diff(prev: Dict[str, Any], cur: Dict[str, Any]) -> Dict[str, Any]:
+    # fields that disappeared are sent as null so the client drops them
+    out = {k: v for k, v in cur.items() if prev.get(k, object()) != v}
+    out.update({k: None for k in prev if k not in cur})
+    return out
+
+def sse(event: str, data: Dict[str, Any], seq: Optional[int] = None) -> str:
+    head = f"id: {seq}\n" if seq is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+async def kpi_frames(request: Request, hub: KpiHub = _hub):
+    """
+    SSE frames for one dashboard. The first frame is a full `snapshot`; later
+    frames are `delta` events carrying only the fields that changed. A
+    `status` event is sent whenever the upstream goes from ok to failing or
+    back, so the UI can mark the values it shows as stale.
+    """
+    seen = hub.subscribe()
+    sent: Optional[Dict[str, Any]] = None
+    ok = hub.ok
+    try:
+        if not ok:
+            # joined mid-outage: no flip is coming to tell us, so say it now
+            yield sse("status", {"ok": False, "error": hub.last_error})
+        while True:
+            # StreamingResponse may not watch for disconnects itself, so check
+            # while waiting rather than holding the poller up until the next write
+            waiter = asyncio.ensure_future(hub.wait(seen, KEEPALIVE))
+            while not waiter.done():
+                if await request.is_disconnected():
+                    waiter.cancel()
+                    return
+                await asyncio.wait({waiter}, timeout=DISCONNECT_CHECK)
+            seq, snap = waiter.result()
+            if seq <= seen:
+                yield ": keepalive\n\n"
+                continue
+            seen = seq
+            if hub.ok != ok:
+                ok = hub.ok
+                yield sse("status", {"ok": ok, "error": hub.last_error})
+            if not snap:
+                continue
+            if sent is None:
+                yield sse("snapshot", snap, seq)
+            else:
+                changed = diff(sent, snap)
+                if changed:
+                    yield sse("delta", changed, seq)
+            sent = snap
+    finally:
+        hub.unsubscribe()
+
 @app.get("/v1/health")
 def health():
     return {"status":"ok","service":"ui"}
@@ -11,3 +163,12 @@ def health():
 def refresh():
     # stub UI action
     return UiAck().model_dump()
+
+@app.get("/v1/kpi/stream")
+async def kpi_stream(request: Request):
+    return StreamingResponse(kpi_frames(request), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/v1/kpi/stream/stats", response_model=KpiStreamStats)
+def kpi_stream_stats():
+    return _hub.stats()
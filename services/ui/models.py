@@ -1,4 +1,11 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class UiAck(BaseModel):
     ok: bool = True
+
+class KpiStreamStats(BaseModel):
+    subscribers: int = 0
+    upstream_active: bool = False
+    seq: int = 0
+    last_error: Optional[str] = None
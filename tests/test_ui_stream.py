@@ -0,0 +1,197 @@
+import asyncio, json
+import httpx
+
+from services.ui import main as ui
+from services.ui.main import KpiHub, diff, kpi_frames
+
+# ---- fakes (no Docker needed) ----
+class FakeOrch:
+    """Stand-in for httpx.AsyncClient; serves whatever `kpi` holds, or raises."""
+    def __init__(self):
+        self.kpi = {"a": 1}
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, *a, **kw):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, url):
+        self.calls += 1
+        if self.down:
+            raise httpx.ConnectError("down")
+        return httpx.Response(200, json=self.kpi, request=httpx.Request("GET", url))
+
+class FakeRequest:
+    def __init__(self):
+        self.gone = False
+
+    async def is_disconnected(self):
+        return self.gone
+
+def fake_orch(monkeypatch):
+    orch = FakeOrch()
+    monkeypatch.setattr(ui.httpx, "AsyncClient", orch)
+    monkeypatch.setattr(ui, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(ui, "KEEPALIVE", 0.05)
+    return orch
+
+def parse(frame):
+    out = {}
+    for line in frame.strip().splitlines():
+        k, _, v = line.partition(": ")
+        out[k] = v
+    if "data" in out:
+        out["data"] = json.loads(out["data"])
+    return out
+
+async def next_event(frames):
+    # skip keepalives
+    while True:
+        f = await asyncio.wait_for(frames.__anext__(), 1.0)
+        if not f.startswith(":"):
+            return parse(f)
+
+# ---- diff ----
+def test_diff_changed_unchanged_and_removed():
+    assert diff({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 5}) == {"b": 5, "c": None}
+    assert diff({"a": 1}, {"a": 1}) == {}
+    assert diff({}, {"a": None}) == {"a": None}
+
+# ---- publish / wait ----
+def test_publish_skips_equal_snapshots():
+    async def run():
+        hub = KpiHub()
+        hub.publish({"a": 1})
+        hub.publish({"a": 1})
+        assert hub.seq == 1
+        hub.publish({"a": 2})
+        assert hub.seq == 2
+    asyncio.run(run())
+
+def test_wait_wakes_on_publish_and_times_out():
+    async def run():
+        hub = KpiHub()
+        waiter = asyncio.create_task(hub.wait(0, 1.0))
+        await asyncio.sleep(0)
+        hub.publish({"a": 1})
+        assert await waiter == (1, {"a": 1})
+        # nothing new: returns the current seq after the timeout
+        assert await hub.wait(1, 0.01) == (1, {"a": 1})
+    asyncio.run(run())
+
+# ---- shared poller lifecycle ----
+def test_subscribers_share_one_poller(monkeypatch):
+    fake_orch(monkeypatch)
+    async def run():
+        hub = KpiHub()
+        hub.subscribe()
+        task = hub._task
+        hub.subscribe()
+        assert hub._task is task and hub.upstream_active
+        hub.unsubscribe()
+        assert hub.upstream_active
+        hub.unsubscribe()
+        assert not hub.upstream_active
+        assert hub.stats().subscribers == 0
+    asyncio.run(run())
+
+def test_slow_subscriber_gets_clean_delta(monkeypatch):
+    fake_orch(monkeypatch)
+    async def run():
+        hub = KpiHub()
+        req = FakeRequest()
+        frames = kpi_frames(req, hub)
+        hub.publish({"a": 1, "b": 1})
+        first = await next_event(frames)
+        assert first["event"] == "snapshot"
+        view = dict(first["data"])
+        # several updates land while the client is not reading
+        hub.publish({"a": 2, "b": 1})
+        hub.publish({"a": 3, "b": 1})
+        hub.publish({"a": 3, "b": 7})
+        nxt = await next_event(frames)
+        assert nxt["event"] == "delta" and int(nxt["id"]) == hub.seq
+        view.update(nxt["data"])
+        assert view == hub.latest
+        await frames.aclose()
+    asyncio.run(run())
+
+# ---- stale snapshot / upstream status ----
+def test_new_subscriber_never_gets_previous_run_snapshot(monkeypatch):
+    orch = fake_orch(monkeypatch)
+    async def run():
+        hub = KpiHub()
+        frames = kpi_frames(FakeRequest(), hub)
+        first = await next_event(frames)
+        assert first["data"] == {"a": 1}
+        await frames.aclose()
+        assert hub.latest == {} and not hub.upstream_active
+        old_seq = hub.seq
+
+        orch.kpi = {"a": 99}
+        orch.down = True
+        frames = kpi_frames(FakeRequest(), hub)
+        ev = await next_event(frames)
+        assert ev["event"] == "status" and ev["data"]["ok"] is False
+        orch.down = False
+        ev = await next_event(frames)
+        assert ev["event"] == "status" and ev["data"]["ok"] is True
+        ev = await next_event(frames)
+        assert ev["event"] == "snapshot" and ev["data"] == {"a": 99}
+        assert int(ev["id"]) > old_seq
+        await frames.aclose()
+    asyncio.run(run())
+
+def test_upstream_failure_is_signalled_to_connected_clients(monkeypatch):
+    orch = fake_orch(monkeypatch)
+    async def run():
+        hub = KpiHub()
+        frames = kpi_frames(FakeRequest(), hub)
+        assert (await next_event(frames))["event"] == "snapshot"
+        orch.down = True
+        ev = await next_event(frames)
+        assert ev["event"] == "status"
+        assert ev["data"] == {"ok": False, "error": "ConnectError: down"}
+        await frames.aclose()
+    asyncio.run(run())
+
+def test_client_joining_mid_outage_gets_failing_status(monkeypatch):
+    orch = fake_orch(monkeypatch)
+    orch.down = True
+    async def run():
+        hub = KpiHub()
+        a = kpi_frames(FakeRequest(), hub)
+        assert (await next_event(a))["data"]["ok"] is False
+        b = kpi_frames(FakeRequest(), hub)
+        ev = await next_event(b)
+        assert ev["event"] == "status"
+        assert ev["data"] == {"ok": False, "error": "ConnectError: down"}
+        await a.aclose()
+        await b.aclose()
+    asyncio.run(run())
+
+def test_disconnect_noticed_before_keepalive(monkeypatch):
+    fake_orch(monkeypatch)
+    monkeypatch.setattr(ui, "KEEPALIVE", 60.0)
+    monkeypatch.setattr(ui, "DISCONNECT_CHECK", 0.01)
+    async def run():
+        hub = KpiHub()
+        req = FakeRequest()
+        frames = kpi_frames(req, hub)
+        assert (await next_event(frames))["event"] == "snapshot"
+        pending = asyncio.ensure_future(frames.__anext__())
+        await asyncio.sleep(0.05)
+        req.gone = True
+        try:
+            await asyncio.wait_for(pending, 1.0)
+            assert False, "stream should have ended"
+        except StopAsyncIteration:
+            pass
+        assert hub.subscribers == 0 and not hub.upstream_active
+    asyncio.run(run())